@@ -0,0 +1,248 @@
+"""
+Test support for JARVIS: local stand-ins for the microphone, the speech
+recognizer, the weather/news endpoints, the SMTP server and the Wikipedia
+API, so the pipelines can be tested and benchmarked offline
+"""
+
+import json
+import math
+import random
+import socketserver
+import threading
+import time
+import urllib.parse
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, List, Tuple, Iterable
+
+from jarvis_ultimate import AudioSource, RecognizerBackend, wikipedia
+
+class SyntheticSource(AudioSource):
+    """Generates silence, noise and voiced tone bursts for headless testing
+    
+    segments is a list of (kind, seconds) with kind 'silence', 'noise'
+    or 'tone'; by default it loops a short silence/speech pattern.
+    """
+    
+    name = "synthetic"
+    
+    def __init__(self, segments: Optional[List[Tuple[str, float]]] = None, frame_ms: int = 30,
+                 realtime: bool = True, loop: bool = True, amplitude: int = 6000, seed: int = 7):
+        super().__init__(16000, frame_ms)
+        self.segments = segments or [('silence', 1.5), ('tone', 1.2), ('silence', 1.0), ('tone', 0.6)]
+        self.realtime = realtime
+        self.loop = loop
+        self.amplitude = amplitude
+        self._rng = random.Random(seed)
+        self._frames = None
+        self._next_due = 0.0
+    
+    def open(self) -> bool:
+        self._frames = self._generate()
+        self._next_due = time.monotonic()
+        return True
+    
+    def _generate(self):
+        sample_index = 0
+        while True:
+            for kind, seconds in self.segments:
+                for _ in range(max(1, int(seconds * 1000 / self.frame_ms))):
+                    frame = array('h', bytes(self.frame_bytes))
+                    for i in range(self.frame_samples):
+                        t = (sample_index + i) / self.sample_rate
+                        if kind == 'tone':
+                            # Two partials with a slow envelope, roughly vowel-like
+                            value = self.amplitude * (0.7 * math.sin(2 * math.pi * 220 * t)
+                                                      + 0.3 * math.sin(2 * math.pi * 660 * t))
+                        elif kind == 'noise':
+                            value = self._rng.gauss(0, self.amplitude / 4)
+                        else:
+                            value = self._rng.gauss(0, 30)
+                        frame[i] = max(-32768, min(32767, int(value)))
+                    sample_index += self.frame_samples
+                    yield frame.tobytes()
+            if not self.loop:
+                return
+    
+    def read(self) -> Optional[bytes]:
+        frame = next(self._frames, None)
+        if frame is not None and self.realtime:
+            self._next_due += self.frame_ms / 1000
+            delay = self._next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return frame
+
+class FakeRecognizer(RecognizerBackend):
+    """Local stand-in: returns scripted transcripts after a simulated delay"""
+    
+    name = "fake"
+    
+    def __init__(self, script: Optional[List[str]] = None, latency: float = 0.3,
+                 jitter: float = 0.2, seed: int = 11):
+        self.script = script or ["what time is it", "system info", "tell me a joke", "help"]
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._count = 0
+        self._lock = threading.Lock()
+    
+    def recognize(self, audio) -> str:
+        with self._lock:
+            text = self.script[self._count % len(self.script)]
+            self._count += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+        time.sleep(delay)
+        return text
+
+class LocalWikipediaStub:
+    """Offline stand-in for the wikipedia module with simulated network latency"""
+    
+    def __init__(self, latency: float = 0.3, pages: Optional[Dict[str, str]] = None,
+                 disambiguations: Optional[Dict[str, List[str]]] = None):
+        self.latency = latency
+        self.calls = 0
+        self.pages = pages or {
+            "python (programming language)": "Python is a high-level programming language. Its design emphasizes readability.",
+            "python (genus)": "Python is a genus of constricting snakes. They are found in Africa and Asia.",
+            "monty python": "Monty Python were a British comedy troupe. They created Flying Circus.",
+            "mercury (planet)": "Mercury is the smallest planet in the Solar System. It is closest to the Sun.",
+            "mercury (element)": "Mercury is a chemical element with symbol Hg. It is a liquid metal.",
+            "freddie mercury": "Freddie Mercury was a British singer. He fronted the band Queen.",
+            "artificial intelligence": "Artificial intelligence is intelligence exhibited by machines. It is a field of computer science.",
+            "alan turing": "Alan Turing was an English mathematician. He is considered a father of computer science."
+        }
+        self.disambiguations = disambiguations or {
+            "python": ["Python (programming language)", "Python (genus)", "Monty Python"],
+            "mercury": ["Mercury (planet)", "Mercury (element)", "Freddie Mercury"]
+        }
+    
+    def summary(self, query: str, sentences: int = 2, **kwargs) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        key = query.lower().strip()
+        if key in self.disambiguations:
+            raise wikipedia.exceptions.DisambiguationError(query, self.disambiguations[key])
+        if key not in self.pages:
+            raise wikipedia.exceptions.PageError(query)
+        return " ".join(self.pages[key].split(". ")[:sentences])
+
+class LocalServiceStub:
+    """Local stand-in HTTP server for the weather and news endpoints
+    
+    Serves /geocode, /forecast and /news with simulated latency over
+    HTTP/1.1 keep-alive, and counts requests and connections. The first
+    failures requests are answered with 503 Service Unavailable.
+    """
+    
+    def __init__(self, latency: float = 0.2, port: int = 0, failures: int = 0):
+        self.latency = latency
+        self.failures = failures
+        self.requests = 0
+        self.connections = 0
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+            
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                if stub.requests <= stub.failures:
+                    self.send_error(503)
+                    return
+                parsed = urllib.parse.urlsplit(self.path)
+                query = dict(urllib.parse.parse_qsl(parsed.query))
+                if parsed.path == '/geocode':
+                    name = query.get('name', '')
+                    body = {'results': [{'name': name.title(), 'country': 'Stubland',
+                                         'latitude': 12.97, 'longitude': 77.59}]} if name else {}
+                elif parsed.path == '/forecast':
+                    body = {'current_weather': {'temperature': 24.5, 'windspeed': 11.2, 'weathercode': 2}}
+                elif parsed.path == '/news':
+                    body = {'hits': [{'title': f"Headline number {i}"} for i in range(1, 11)]}
+                else:
+                    self.send_error(404)
+                    return
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+    
+    def start(self) -> 'LocalServiceStub':
+        threading.Thread(target=self.server.serve_forever, name="jarvis-service-stub", daemon=True).start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class LocalSmtpStub:
+    """Minimal local SMTP server for tests: accepts AUTH PLAIN and any message
+    
+    Recipients listed in refused are rejected at RCPT TO with a 550.
+    """
+    
+    def __init__(self, port: int = 0, refused: Iterable[str] = ()):
+        self.refused = set(refused)
+        self.connections = 0
+        self.messages = 0
+        stub = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str):
+                self.wfile.write((line + "\r\n").encode('ascii'))
+            
+            def handle(self):
+                stub.connections += 1
+                self.reply("220 jarvis-stub ESMTP")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode('utf-8', 'replace').strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb in ('EHLO', 'HELO'):
+                        self.reply("250-jarvis-stub")
+                        self.reply("250-AUTH PLAIN")
+                        self.reply("250 8BITMIME")
+                    elif verb == 'AUTH':
+                        self.reply("235 Authentication successful")
+                    elif verb == 'RCPT' and command.partition(':')[2].strip(' <>') in stub.refused:
+                        self.reply("550 No such user here")
+                    elif verb == 'DATA':
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline().rstrip(b"\r\n") != b".":
+                            pass
+                        stub.messages += 1
+                        self.reply("250 Queued")
+                    elif verb == 'QUIT':
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+        
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+    
+    def start(self) -> 'LocalSmtpStub':
+        threading.Thread(target=self.server.serve_forever, name="jarvis-smtp-stub", daemon=True).start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
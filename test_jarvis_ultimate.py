@@ -0,0 +1,423 @@
+"""Regression tests for jarvis_ultimate"""
+
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import jarvis_ultimate as jarvis
+from jarvis_testing import LocalServiceStub, LocalSmtpStub, LocalWikipediaStub, SyntheticSource
+
+
+class FakeBackend(jarvis.SpeechBackend):
+    """Renders every reply and records anything spoken directly"""
+
+    name = "fake"
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.spoken = []
+
+    def open(self) -> bool:
+        return True
+
+    def speak(self, text: str) -> bool:
+        self.spoken.append(text)
+        return True
+
+    def synthesize(self, text: str):
+        return b'RIFF' + text.encode()
+
+
+class FakePlayer:
+    """Plays until stop() is called, then reports failure like a killed aplay"""
+
+    available = True
+
+    def __init__(self):
+        self.playing = threading.Event()
+        self._stopped = threading.Event()
+
+    def play(self, wav: bytes) -> bool:
+        self.playing.set()
+        self._stopped.wait(timeout=5)
+        return False
+
+    def stop(self):
+        self._stopped.set()
+
+
+def make_worker(monkeypatch, tmp_path):
+    monkeypatch.setattr(jarvis.SpeechWorker, 'BACKENDS', (FakeBackend, jarvis.NullBackend))
+    config = jarvis.JarvisConfig()
+    config.config = config._get_default_config()
+    config.config['speech']['backends'] = ['fake']
+    config.config['speech']['cache']['directory'] = str(tmp_path / 'speech')
+    worker = jarvis.SpeechWorker(config)
+    worker.player = FakePlayer()
+    worker.start()
+    return worker
+
+
+def test_barge_in_does_not_respeak_reply(monkeypatch, tmp_path):
+    worker = make_worker(monkeypatch, tmp_path)
+    try:
+        future = worker.submit("Here is a long reply.")
+        assert worker.player.playing.wait(timeout=5)
+        worker.cancel()
+
+        assert future.result(timeout=5) is False
+        assert worker.backend.spoken == []
+        assert worker.breakers['fake'].failures == 0
+    finally:
+        worker.stop()
+
+
+
+def test_lazy_modules_import_each_other_from_two_threads(monkeypatch, tmp_path):
+    # a sleeps while holding its import lock, then imports b; b imports a.
+    # Without a shared lock the second thread gets a half-built module.
+    (tmp_path / 'lazy_race_a.py').write_text("import time\ntime.sleep(0.3)\nimport lazy_race_b\nx = lazy_race_b.y\n")
+    (tmp_path / 'lazy_race_b.py').write_text("import lazy_race_a\ny = 2\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ('lazy_race_a', 'lazy_race_b'):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+    first, second = jarvis.LazyModule('lazy_race_a'), jarvis.LazyModule('lazy_race_b')
+    results, errors = {}, []
+
+    def touch(module, attribute):
+        try:
+            results[attribute] = getattr(module, attribute)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=touch, args=(first, 'x')),
+               threading.Thread(target=touch, args=(second, 'y'))]
+    threads[0].start()
+    time.sleep(0.1)
+    threads[1].start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert errors == []
+    assert results == {'x': 2, 'y': 2}
+
+
+def test_requests_and_wikipedia_first_import_from_many_threads():
+    # Needs a fresh interpreter: the race only exists on the first import
+    script = textwrap.dedent("""
+        import threading
+        import jarvis_ultimate as jarvis
+
+        touches = [lambda: jarvis.requests.adapters.HTTPAdapter, lambda: jarvis.wikipedia.search,
+                   lambda: jarvis.requests.Session, lambda: jarvis.wikipedia.exceptions.PageError]
+        barrier = threading.Barrier(len(touches) * 2 + 1)
+        errors = []
+
+        def touch(get):
+            barrier.wait()
+            try:
+                get()
+            except Exception as e:
+                errors.append(repr(e))
+
+        threads = [threading.Thread(target=touch, args=(get,)) for get in touches * 2]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        jarvis.LazyModule.preload(jarvis.wikipedia, jarvis.requests).join()
+        for thread in threads:
+            thread.join()
+        print(errors)
+    """)
+    result = subprocess.run([sys.executable, '-c', script], cwd=Path(__file__).parent,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == '[]'
+
+
+@pytest.fixture(scope='module')
+def router():
+    # _build_router only binds handler methods, so no subsystem needs to start
+    return jarvis.JarvisUltimate._build_router(object.__new__(jarvis.JarvisUltimate))
+
+
+@pytest.mark.parametrize('command, intent', [
+    ("weather 5-day forecast", 'weather'),
+    ("news 2024-25 season", 'news'),
+    ("what time is it in utc+2", 'time'),
+    ("send email to bob-1@x.com", 'email'),
+    ("search time zones", 'search'),
+    ("start the stopwatch", None),
+    ("is this on", None),
+    ("stop", 'exit'),
+    ("hi there", 'greeting'),
+    ("2 + 2", 'calculate'),
+    ("(3 + 4) * 2", 'calculate'),
+    ("calculate 5-day average", 'calculate'),
+    ("sum of x^2 for x from 1 to 10", 'calculate'),
+])
+def test_route(router, command, intent):
+    match = router.dispatch(command)
+    assert (match.intent.name if match else None) == intent
+
+
+class LatePowerShell:
+    """Stands in for the PowerShell process: answers every request after the caller gave up"""
+
+    def __init__(self, backend, delay: float):
+        self.backend = backend
+        self.delay = delay
+        self.stdin = self
+
+    def write(self, line: str):
+        parts = line.rstrip("\n").split("\t")
+        marker = jarvis.PowerShellBackend.DONE_MARKER
+        reply = f"{marker} {parts[1]}" if parts[1].isdigit() else marker
+        threading.Timer(self.delay, self.backend._lines.put, args=(reply,)).start()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def poll(self):
+        return None
+
+    def wait(self, timeout=None):
+        return 0
+
+
+def test_powershell_late_marker_is_not_taken_for_the_next_request(monkeypatch):
+    monkeypatch.setattr(jarvis.PowerShellBackend, 'speaking_timeout', lambda self, text: 0.1)
+    backend = jarvis.PowerShellBackend(jarvis.JarvisConfig())
+    backend.process = LatePowerShell(backend, delay=0.15)
+
+    assert backend.speak("first") is False   # times out; its marker arrives later
+    assert backend.speak("second") is False  # must not return on the first request's marker
+
+
+def test_powershell_timeouts_trip_the_breaker(monkeypatch, tmp_path):
+    def open_late(self):
+        self.process = LatePowerShell(self, delay=0.15)
+        return True
+
+    monkeypatch.setattr(jarvis.PowerShellBackend, 'supported', classmethod(lambda cls, config: True))
+    monkeypatch.setattr(jarvis.PowerShellBackend, 'open', open_late)
+    monkeypatch.setattr(jarvis.PowerShellBackend, 'speaking_timeout', lambda self, text: 0.1)
+    config = jarvis.JarvisConfig()
+    config.config = config._get_default_config()
+    config.config['speech']['backends'] = ['powershell']
+    config.config['speech']['cache']['enabled'] = False
+    worker = jarvis.SpeechWorker(config)
+    worker.start()
+    try:
+        results = [worker.submit(f"Reply {i}.").result(timeout=5) for i in range(3)]
+        assert results == [False, False, False]
+        assert worker.breakers['powershell'].is_open
+        assert worker.backend.name == 'null'
+    finally:
+        worker.stop()
+
+def test_ring_buffer_overwrites_oldest_audio():
+    ring = jarvis.AudioRingBuffer(8)
+    ring.write(b'abcdef')
+    ring.write(b'ghij')
+    assert (ring.written, ring.oldest) == (10, 2)
+    slices = ring.read(0, 10)
+    assert len(slices) == 2  # wrapped, handed out without copying
+    assert b''.join(slices) == b'cdefghij'
+
+    ring.write(b'0123456789AB')  # more than the whole ring
+    assert (ring.written, ring.oldest) == (22, 14)
+    assert b''.join(ring.read(10, 22)) == b'456789AB'
+    assert ring.read(0, 14) == []
+
+
+class LengthRecognizer(jarvis.RecognizerBackend):
+    """Takes longer on longer utterances, so a short one finishes first"""
+
+    name = "length"
+
+    def recognize(self, audio) -> str:
+        seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        time.sleep(seconds * 0.4)
+        return f"{seconds:.1f} seconds"
+
+
+def test_recognition_pipeline_releases_transcripts_in_capture_order():
+    segments = [('silence', 0.3), ('tone', 1.5), ('silence', 0.6), ('tone', 0.3), ('silence', 0.6),
+                ('tone', 0.3), ('silence', 0.6)]
+    capture = jarvis.AudioCapture(SyntheticSource(segments, realtime=False, loop=False))
+    assert capture.start()
+    segmenter = jarvis.UtteranceSegmenter(capture, pause_seconds=0.3)
+    segmenter.seek(0)
+    pipeline = jarvis.RecognitionPipeline(segmenter, LengthRecognizer(), workers=3)
+    pipeline.active.set()
+    pipeline.start()
+    try:
+        transcripts = [pipeline.get(timeout=10) for _ in range(3)]
+    finally:
+        pipeline.stop()
+        capture.stop()
+
+    assert [transcript.sequence for transcript in transcripts] == [0, 1, 2]
+    # The long first utterance finished last but was still released first
+    assert transcripts[1].recognized_at < transcripts[0].recognized_at
+
+
+def test_recognizer_backends_must_implement_recognize():
+    class Incomplete(jarvis.RecognizerBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    assert LengthRecognizer().name == "length"
+
+
+def test_wikipedia_cache_hits_normalized_queries_and_prefetched_candidates(tmp_path):
+    stub = LocalWikipediaStub(latency=0)
+    service = jarvis.WikipediaService(jarvis.WikipediaCache(str(tmp_path / 'wikipedia.db')), client=stub)
+
+    answer = service.summary("Alan Turing")
+    assert service.summary("the alan turing?") == answer
+    assert (service.hits, service.misses, stub.calls) == (1, 1, 1)
+
+    with pytest.raises(jarvis.wikipedia.exceptions.DisambiguationError):
+        service.summary("python")
+    service.wait_for_prefetch(timeout=5)
+    calls = stub.calls
+    assert service.summary("Python (genus)").startswith("Python is a genus")
+    assert stub.calls == calls
+
+
+def test_wikipedia_cache_entries_expire(tmp_path):
+    stub = LocalWikipediaStub(latency=0)
+    cache = jarvis.WikipediaCache(str(tmp_path / 'wikipedia.db'), ttl_seconds=0.2)
+    service = jarvis.WikipediaService(cache, client=stub)
+
+    service.summary("Alan Turing")
+    service.summary("Alan Turing")
+    assert stub.calls == 1
+    time.sleep(0.3)
+    service.summary("Alan Turing")
+    assert stub.calls == 2
+    assert (service.hits, service.misses) == (1, 2)
+
+
+def test_circuit_breaker_opens_after_threshold_and_backs_off():
+    breaker = jarvis.CircuitBreaker(threshold=2, reset_seconds=0.1, max_seconds=0.15)
+    assert breaker.record_failure() is False
+    assert breaker.allows()
+    assert breaker.record_failure() is True
+    assert breaker.is_open and not breaker.allows()
+
+    time.sleep(0.12)
+    assert breaker.allows()
+    breaker.trip()  # the re-probe failed: wait longer, up to max_seconds
+    assert breaker.retry_at - time.monotonic() > 0.12
+    assert breaker.delay == 0.15
+
+    breaker.record_success()
+    assert not breaker.is_open and breaker.failures == 0 and breaker.delay == 0.1
+
+
+@pytest.fixture
+def service_stub():
+    stub = LocalServiceStub(latency=0, failures=2).start()
+    yield stub
+    stub.stop()
+
+
+def test_service_client_retries_unavailable_upstream(service_stub):
+    client = jarvis.AsyncServiceClient(retries=2, backoff=0.01, cache_ttl=0)
+    try:
+        headlines = jarvis.NewsService(client, f"{service_stub.base_url}/news").headlines(2)
+        assert headlines == ["Headline number 1", "Headline number 2"]
+        assert service_stub.requests == 3
+    finally:
+        client.close()
+
+
+def test_service_client_gives_up_after_retries(service_stub):
+    client = jarvis.AsyncServiceClient(retries=1, backoff=0.01, cache_ttl=0)
+    try:
+        with pytest.raises(jarvis.ServiceError, match="503"):
+            client.get_json(f"{service_stub.base_url}/news")
+        assert service_stub.requests == 2
+    finally:
+        client.close()
+
+
+@pytest.fixture
+def smtp_stub():
+    stub = LocalSmtpStub(refused=['nobody@example.com']).start()
+    yield stub
+    stub.stop()
+
+
+def make_outbox(path, stub, **kwargs):
+    pool = jarvis.SmtpSessionPool('127.0.0.1', stub.port, 'jarvis@example.com', 'secret', use_tls=False)
+    return jarvis.EmailOutbox(str(path), pool, **kwargs)
+
+
+def test_outbox_delivers_messages_left_over_from_a_crash(smtp_stub, tmp_path):
+    crashed = threading.Event()
+    outbox = make_outbox(tmp_path / 'outbox.db', smtp_stub)
+    # Claim the message, then die before sending it
+    outbox._send_batch = lambda rows: crashed.set()
+    outbox.enqueue('user@example.com', "Hello", "body")
+    assert crashed.wait(timeout=5)
+    outbox.stop()
+    assert smtp_stub.messages == 0
+
+    restarted = make_outbox(tmp_path / 'outbox.db', smtp_stub)
+    try:
+        assert restarted.status()['pending'] == 1
+        restarted.start()
+        assert restarted.wait_until_drained(timeout=10)
+        assert restarted.status()['sent'] == 1
+        assert smtp_stub.messages == 1
+    finally:
+        restarted.stop()
+
+
+def test_outbox_fails_refused_recipients_without_retrying(smtp_stub, tmp_path):
+    outbox = make_outbox(tmp_path / 'outbox.db', smtp_stub, max_attempts=5, retry_base=60)
+    try:
+        outbox.enqueue('nobody@example.com', "Hello", "body")
+        outbox.enqueue('user@example.com', "Hello", "body")
+        assert outbox.wait_until_drained(timeout=10)
+        status = outbox.status()
+        assert (status['sent'], status['failed'], status['pending']) == (1, 1, 0)
+        assert status['last_error'].startswith('nobody@example.com')
+        assert smtp_stub.messages == 1
+    finally:
+        outbox.stop()
+
+
+def test_service_manager_opens_the_outbox_on_first_email(smtp_stub, tmp_path, monkeypatch):
+    leftover = make_outbox(tmp_path / 'outbox.db', smtp_stub)
+    monkeypatch.setattr(leftover, 'start', lambda: None)
+    leftover.enqueue('user@example.com', "Earlier", "body")
+
+    config = jarvis.JarvisConfig()
+    config.config = config._get_default_config()
+    config.config['email'].update({'sender_email': 'jarvis@example.com', 'app_password': 'secret',
+                                   'smtp_server': '127.0.0.1', 'smtp_port': smtp_stub.port,
+                                   'use_tls': False, 'outbox_path': str(tmp_path / 'outbox.db')})
+    manager = jarvis.ServiceManager(config)
+    try:
+        assert manager._outbox is None
+        assert manager.send_email('user@example.com', "Now", "body")
+        assert manager.outbox.wait_until_drained(timeout=10)
+        assert manager.outbox.status()['sent'] == 2
+    finally:
+        manager.outbox.stop()
+        manager.http.close()